@@ -0,0 +1,123 @@
+"""
+Startup benchmark for the Python backend
+
+Measures import time per module (each in a fresh interpreter) and the
+first-request latency of the FastAPI app, and compares them against
+startup_budget.json.
+
+Usage:
+    python bench_startup.py            # report
+    python bench_startup.py --check    # exit 1 if any budget is exceeded
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, Any, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BUDGET_FILE = os.path.join(HERE, "startup_budget.json")
+
+IMPORT_SNIPPET = """
+import json, time
+t = time.perf_counter()
+import {module}
+print(json.dumps({{"import_ms": (time.perf_counter() - t) * 1000}}))
+"""
+
+FIRST_REQUEST_SNIPPET = """
+import json, time
+import {module}
+from fastapi.testclient import TestClient
+client = TestClient({module}.app)
+t = time.perf_counter()
+resp = client.get("{path}")
+print(json.dumps({{"first_request_ms": (time.perf_counter() - t) * 1000, "status": resp.status_code}}))
+"""
+
+
+def run_snippet(code: str) -> Dict[str, Any]:
+    """Run code in a fresh interpreter and return the JSON it prints"""
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=HERE, capture_output=True, text=True, timeout=120,
+    )
+    if proc.returncode != 0:
+        lines = proc.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else f"exit code {proc.returncode}"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def measure(module: str, runs: int, first_request: Optional[str] = None) -> Dict[str, Any]:
+    """Median import time (and first-request latency) over several runs"""
+    result: Dict[str, Any] = {}
+    samples: List[float] = []
+    for _ in range(runs):
+        out = run_snippet(IMPORT_SNIPPET.format(module=module))
+        if "error" in out:
+            return {"error": out["error"]}
+        samples.append(out["import_ms"])
+    result["import_ms"] = round(statistics.median(samples), 1)
+
+    if first_request:
+        samples = []
+        for _ in range(runs):
+            out = run_snippet(FIRST_REQUEST_SNIPPET.format(module=module, path=first_request))
+            if "error" in out:
+                result["first_request_error"] = out["error"]
+                break
+            samples.append(out["first_request_ms"])
+        if samples:
+            result["first_request_ms"] = round(statistics.median(samples), 1)
+    return result
+
+
+def check_budget(module: str, result: Dict[str, Any], budget: Dict[str, Any], scale: float) -> List[str]:
+    """Return a list of budget violations for one module"""
+    if "error" in result:
+        return [f"{module}: import failed ({result['error']})"]
+    failures = []
+    for metric in ("import_ms", "first_request_ms"):
+        limit = budget.get(metric)
+        if limit is None:
+            continue
+        value = result.get(metric)
+        if value is None:
+            failures.append(f"{module}: {metric} not measured ({result.get('first_request_error')})")
+        elif value > limit * scale:
+            failures.append(f"{module}: {metric} {value} > budget {limit * scale:g}")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="exit 1 if a budget is exceeded")
+    parser.add_argument("--runs", type=int, default=3, help="runs per module (median is reported)")
+    parser.add_argument("--modules", nargs="*", help="only measure these modules")
+    args = parser.parse_args()
+
+    with open(BUDGET_FILE) as f:
+        budgets = json.load(f)
+    # Slower CI machines can loosen every budget at once
+    scale = float(os.getenv("STARTUP_BUDGET_SCALE", "1.0"))
+
+    failures = []
+    for module, budget in budgets["modules"].items():
+        if args.modules and module not in args.modules:
+            continue
+        result = measure(module, args.runs, budget.get("first_request_path"))
+        print(f"{module:16} {json.dumps(result)}")
+        failures += check_budget(module, result, budget, scale)
+
+    if failures:
+        print("\nStartup budget exceeded:" if args.check else "\nOver budget:")
+        for failure in failures:
+            print(f"  - {failure}")
+    return 1 if (args.check and failures) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
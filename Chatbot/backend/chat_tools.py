@@ -2,8 +2,9 @@
 Simple chat tools for testing MCP integration
 """
 
+from functools import lru_cache
 from typing import Dict, Any
-from store_data import store_tool
+from store_data import get_store_tool
 
 class SimpleTool:
     """Simple tool class for basic operations"""
@@ -37,7 +38,7 @@ class SimpleTool:
                     "error": f"Invalid arguments: {e}"
                 }
         elif tool_name == "store_data":
-            return await store_tool.call_tool(tool_name, arguments)
+            return await get_store_tool().call_tool(tool_name, arguments)
         
         return {
             "success": False,
@@ -48,8 +49,10 @@ class SimpleTool:
         """Get list of available tools"""
         return list(self.tools.values())
 
-# Global tool instance
-mcp = SimpleTool()
+@lru_cache(maxsize=None)
+def get_mcp() -> SimpleTool:
+    """Global tool instance, created on first use"""
+    return SimpleTool()
 
 async def initialize_mcp():
     """Initialize MCP server (no-op for simple tool)"""
@@ -1,5 +1,6 @@
-import os, uuid, json, requests, sys, readline
+import os, uuid, json, requests, sys
 import time
+from functools import lru_cache
 from dotenv import load_dotenv
 
 # Load environment
@@ -10,11 +11,15 @@ BASE_URL = os.getenv("ASI_BASE_URL", "https://agentverse.ai/api/v1")
 MODEL = os.getenv("ASI_MODEL", "asi1-fast-agentic")
 TIMEOUT = 90  # seconds
 
-if not API_KEY:
-	raise RuntimeError("ASI_API_KEY not set. Export it or add it to .env")
-
 ENDPOINT = f"{BASE_URL.rstrip('/')}/chat/completions"
 
+@lru_cache(maxsize=None)
+def get_client():
+	"""Create the HTTP session on first use so importing this module has no side effects"""
+	if not API_KEY:
+		raise RuntimeError("ASI_API_KEY not set. Export it or add it to .env")
+	return requests.Session()
+
 # In-memory session management
 SESSION_MAP: dict[str, str] = {}
 
@@ -44,12 +49,12 @@ def ask(conv_id: str, messages: list[dict], *, stream: bool = False) -> str:
 	}
 
 	if not stream:
-		resp = requests.post(ENDPOINT, headers=headers, json=payload, timeout=TIMEOUT)
+		resp = get_client().post(ENDPOINT, headers=headers, json=payload, timeout=TIMEOUT)
 		resp.raise_for_status()
 		return resp.json()["choices"][0]["message"]["content"]
 
 	# Streaming implementation
-	with requests.post(ENDPOINT, headers=headers, json=payload, timeout=TIMEOUT, stream=True) as resp:
+	with get_client().post(ENDPOINT, headers=headers, json=payload, timeout=TIMEOUT, stream=True) as resp:
 		resp.raise_for_status()
 		full_text = ""
 		for line in resp.iter_lines(decode_unicode=True):
@@ -72,7 +77,8 @@ def ask(conv_id: str, messages: list[dict], *, stream: bool = False) -> str:
 		return full_text
 
 # Simple usage example - agent will be called from Agentverse marketplace
-conv_id = str(uuid.uuid4())
-messages = [{"role": "user", "content": "Best agent in agentverse"}]
-reply = ask(conv_id, messages, stream=True)
-print(f"Assistant: {reply}")
\ No newline at end of file
+if __name__ == "__main__":
+	conv_id = str(uuid.uuid4())
+	messages = [{"role": "user", "content": "Best agent in agentverse"}]
+	reply = ask(conv_id, messages, stream=True)
+	print(f"Assistant: {reply}")
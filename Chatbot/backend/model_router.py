@@ -0,0 +1,158 @@
+"""
+Model router for picking between the fast and full ASI models
+"""
+
+import os
+import re
+import threading
+from typing import Dict, Any, List, Optional
+
+FAST = "fast"
+FULL = "full"
+ROUTING_MODES = ("on", "off", "shadow")
+
+# Words that point at a plain swap / balance intent conversion
+INTENT_KEYWORDS = (
+    "swap", "balance", "send", "transfer", "bridge", "stake",
+    "wallet", "token", "eth", "bnb", "ada", "trx",
+)
+
+# Words that point at open-ended reasoning
+REASONING_KEYWORDS = (
+    "why", "explain", "compare", "difference", "how does", "how do",
+    "should i", "pros and cons", "strategy", "analyze", "analyse",
+    "step by step", "write", "code", "debug",
+)
+
+
+def keyword_pattern(keywords) -> re.Pattern:
+    """Match any keyword as a whole word (or phrase)"""
+    return re.compile(r"\b(?:" + "|".join(re.escape(k) for k in keywords) + r")\b")
+
+
+INTENT_PATTERN = keyword_pattern(INTENT_KEYWORDS)
+REASONING_PATTERN = keyword_pattern(REASONING_KEYWORDS)
+
+CODE_PATTERN = re.compile(r"```|def |function |class |=>|;\s*$", re.MULTILINE)
+
+
+class ModelRouter:
+    """Route chat requests to a fast or full model using cheap local features"""
+
+    def __init__(
+        self,
+        fast_model: str,
+        full_model: str,
+        mode: str = "shadow",
+        max_fast_chars: int = 240,
+        max_fast_turns: int = 6,
+    ):
+        mode = mode.strip().lower()
+        if mode not in ROUTING_MODES:
+            raise ValueError(f"Invalid ASI_ROUTING mode {mode!r}; expected one of {', '.join(ROUTING_MODES)}")
+        self.models = {FAST: fast_model, FULL: full_model}
+        self.mode = mode
+        self.max_fast_chars = max_fast_chars
+        self.max_fast_turns = max_fast_turns
+        self._lock = threading.Lock()
+        # Live routing stats per route, and shadow-mode stats of the served
+        # (default) model grouped by the route the router would have picked
+        self._stats = {route: self._empty_stats() for route in self.models}
+        self._shadow_stats = {route: self._empty_stats() for route in self.models}
+        self._shadow_model: Optional[str] = None
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, Any]:
+        return {"requests": 0, "errors": 0, "latency_ms": 0.0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def features(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Extract the local features used for classification"""
+        last_user = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        text = last_user.lower()
+        return {
+            "chars": len(last_user),
+            "turns": sum(1 for m in messages if m.get("role") != "system"),
+            "intent_hits": len(INTENT_PATTERN.findall(text)),
+            "reasoning_hits": len(REASONING_PATTERN.findall(text)),
+            "has_code": bool(CODE_PATTERN.search(last_user)),
+            "questions": text.count("?"),
+        }
+
+    def classify(self, messages: List[Dict[str, Any]]) -> str:
+        """Return FAST for short intent conversions, FULL for open-ended reasoning"""
+        f = self.features(messages)
+        if f["has_code"] or f["reasoning_hits"] > 0 or f["questions"] > 1:
+            return FULL
+        if f["chars"] > self.max_fast_chars or f["turns"] > self.max_fast_turns:
+            return FULL
+        if f["intent_hits"] > 0 or f["chars"] <= self.max_fast_chars // 2:
+            return FAST
+        return FULL
+
+    def select(self, messages: List[Dict[str, Any]], default_model: str) -> Dict[str, Any]:
+        """Pick the model to call for this request.
+
+        In "off" mode the default model is always used. In "shadow" mode the
+        default model is used as well, but the router decision is returned as
+        "shadow" so record() can file the served request under it.
+        """
+        if self.mode == "off":
+            return {"route": None, "model": default_model, "shadow": None}
+        route = self.classify(messages)
+        if self.mode == "shadow":
+            return {"route": None, "model": default_model, "shadow": route}
+        return {"route": route, "model": self.models[route], "shadow": None}
+
+    def record(self, selection: Dict[str, Any], latency_ms: float, usage: Optional[Dict[str, Any]] = None, error: bool = False):
+        """Record latency and token usage for a request chosen by select()"""
+        if selection.get("route"):
+            stats_by_route, route = self._stats, selection["route"]
+        elif selection.get("shadow"):
+            stats_by_route, route = self._shadow_stats, selection["shadow"]
+        else:
+            return
+        usage = usage or {}
+        with self._lock:
+            if stats_by_route is self._shadow_stats:
+                self._shadow_model = selection.get("model")
+            stats = stats_by_route[route]
+            stats["requests"] += 1
+            stats["latency_ms"] += latency_ms
+            stats["prompt_tokens"] += int(usage.get("prompt_tokens") or 0)
+            stats["completion_tokens"] += int(usage.get("completion_tokens") or 0)
+            if error:
+                stats["errors"] += 1
+
+    @staticmethod
+    def _summary(stats: Dict[str, Any], model: Optional[str]) -> Dict[str, Any]:
+        n = stats["requests"]
+        return {**stats, "model": model, "avg_latency_ms": round(stats["latency_ms"] / n, 2) if n else None}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-route latency/cost stats and shadow-mode comparison.
+
+        "shadow" holds the served model's stats split by the route the router
+        would have picked, e.g. how slow / costly the default model was on the
+        requests that would have gone to the fast model.
+        """
+        with self._lock:
+            routes = {route: self._summary(stats, self.models[route]) for route, stats in self._stats.items()}
+            shadow = {
+                f"would_{route}": {**self._summary(stats, self._shadow_model), "would_use": self.models[route]}
+                for route, stats in self._shadow_stats.items()
+            }
+            return {"mode": self.mode, "routes": routes, "shadow": shadow}
+
+
+def router_from_env(default_model: str) -> ModelRouter:
+    """Build a router from ASI_FAST_MODEL / ASI_FULL_MODEL / ASI_ROUTING env vars.
+
+    Routing defaults to shadow mode so the configured ASI_MODEL keeps serving
+    traffic until ASI_ROUTING=on is set explicitly.
+    """
+    return ModelRouter(
+        fast_model=os.getenv("ASI_FAST_MODEL", "asi1-fast-agentic"),
+        full_model=os.getenv("ASI_FULL_MODEL", default_model),
+        mode=os.getenv("ASI_ROUTING", "shadow"),
+        max_fast_chars=int(os.getenv("ASI_ROUTING_MAX_FAST_CHARS", "240")),
+    )
@@ -0,0 +1,145 @@
+"""
+On-demand sampling profiler for live chat traffic
+
+A background thread samples every thread's stack at a fixed interval while a
+profile window is open and aggregates them in collapsed-stack format
+("frame;frame;frame count", as consumed by flamegraph.pl / speedscope).
+ProfilerMiddleware records per-request wall and CPU time during the window.
+When no window is open the middleware is a single attribute check.
+
+The profiler is per process: with several uvicorn workers each one has its
+own window, so every status/report carries the worker's pid.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Any, List, Optional
+
+
+class SamplingProfiler:
+    """Collect stack samples for N seconds or N requests"""
+
+    def __init__(self):
+        self.active = False
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._reset({})
+
+    def _reset(self, config: Dict[str, Any]):
+        self.config = config
+        self.stacks: Counter = Counter()
+        self.requests: List[Dict[str, Any]] = []
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+
+    def start(self, seconds: float = 10.0, max_requests: Optional[int] = None, interval_ms: float = 5.0) -> Dict[str, Any]:
+        """Open a profile window; it closes after `seconds` or `max_requests` requests"""
+        with self._lock:
+            if self.active:
+                raise RuntimeError("Profiler is already running")
+            self._reset({"seconds": seconds, "max_requests": max_requests, "interval_ms": interval_ms})
+            self._stop.clear()
+            self.started_at = time.time()
+            self.active = True
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+        return self.status()
+
+    def stop(self):
+        """Close the profile window early"""
+        self._stop.set()
+        thread = self._thread
+        if thread and thread is not threading.current_thread():
+            thread.join(timeout=2.0)
+
+    def _run(self):
+        interval = self.config["interval_ms"] / 1000
+        deadline = time.monotonic() + self.config["seconds"]
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+            self._stop.wait(interval)
+        self.active = False
+        self.stopped_at = time.time()
+
+    def record_request(self, path: str, wall_ms: float, cpu_ms: float, status: Optional[int]):
+        """Called by the middleware for every request inside the window"""
+        with self._lock:
+            self.requests.append({"path": path, "wall_ms": round(wall_ms, 2), "cpu_ms": round(cpu_ms, 2), "status": status})
+            max_requests = self.config.get("max_requests")
+            if max_requests and len(self.requests) >= max_requests:
+                self._stop.set()
+
+    def collapsed(self) -> str:
+        """Aggregated stacks in collapsed-stack (flamegraph) format"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "active": self.active,
+            "config": self.config,
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+            "samples": self.samples,
+            "requests": len(self.requests),
+        }
+
+    def report(self) -> Dict[str, Any]:
+        """Status, collapsed stacks and per-request timings"""
+        with self._lock:
+            requests = list(self.requests)
+        return {**self.status(), "collapsed": self.collapsed(), "request_timings": requests}
+
+
+class ProfilerMiddleware:
+    """ASGI middleware timing requests while the profiler window is open"""
+
+    def __init__(self, app, profiler: SamplingProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if not self.profiler.active or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = {}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        # CPU time is for the event loop thread, so it includes concurrent requests
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.profiler.record_request(
+                scope["path"],
+                (time.perf_counter() - wall) * 1000,
+                (time.thread_time() - cpu) * 1000,
+                status.get("code"),
+            )
+
+
+# Global profiler instance
+profiler = SamplingProfiler()
@@ -3,12 +3,25 @@ import uuid
 import requests
 import json
 import re
-from typing import List, Literal, Dict, Any, Optional
-from fastapi import FastAPI, HTTPException
+import time
+import asyncio
+import hashlib
+import hmac
+import multiprocessing
+from functools import lru_cache
+from typing import List, Literal, Dict, Any, Optional, Iterator
+from fastapi import FastAPI, Header, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, ValidationError
 from dotenv import load_dotenv
-# from .chat_tools import mcp, initialize_mcp, shutdown_mcp
+from model_router import router_from_env
+from ws_manager import manager
+from shared_state import SQLiteState, state_from_env
+from profiler import ProfilerMiddleware, profiler
+from chat_tools import get_mcp
+from speculation import SPECULATIVE_SAFE_TOOLS, bridge_request, parse_balance_arguments, tool_matches_reply
+# from .chat_tools import initialize_mcp, shutdown_mcp
 load_dotenv()
 
 ASI_API_KEY = os.getenv("ASI_API_KEY")
@@ -17,6 +30,13 @@ MODEL = os.getenv("ASI_MODEL", "asi1-mini")
 PORT = int(os.getenv("PORT", "8002"))
 ENDPOINT = f"{BASE_URL}/chat/completions"
 TIMEOUT = 90
+WORKERS = int(os.getenv("WORKERS", "1"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "0"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", "86400"))
+RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", "0"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+SPECULATIVE_TOOLS = os.getenv("SPECULATIVE_TOOLS", "0").lower() in ("1", "true", "on")
+UAGENT_BRIDGE_URL = os.getenv("UAGENT_BRIDGE_URL", "http://localhost:5000/api/uagent/request")
 # Updated system prompt to resemble OpenAI best model
 system_prompt = f"""
 You are a highly intelligent, helpful, and concise AI assistant.
@@ -49,11 +69,47 @@ You are a highly intelligent, helpful, and concise AI assistant.
 """
 
 
-if not ASI_API_KEY:
-	raise RuntimeError("ASI_API_KEY not set. Add it to .env or export it in the shell.")
-
 app = FastAPI(title="basic_chat_bot API")
 
+# Clients and shared objects are built on first use so importing this module stays cheap
+
+@lru_cache(maxsize=None)
+def get_api_key() -> str:
+	if not ASI_API_KEY:
+		raise RuntimeError("ASI_API_KEY not set. Add it to .env or export it in the shell.")
+	return ASI_API_KEY
+
+@lru_cache(maxsize=None)
+def get_http() -> requests.Session:
+	"""Pooled HTTP session for upstream calls"""
+	return requests.Session()
+
+@lru_cache(maxsize=None)
+def get_router():
+	"""Routes short intent conversions to the fast model, reasoning to the full one"""
+	return router_from_env(MODEL)
+
+@lru_cache(maxsize=None)
+def get_state():
+	"""Sessions, response cache and rate-limit counters; use STATE_BACKEND=sqlite with WORKERS > 1"""
+	state = state_from_env()
+	# `uvicorn --workers N` runs each worker as a child process without setting WORKERS
+	in_worker = multiprocessing.parent_process() is not None
+	if (WORKERS > 1 or in_worker) and not isinstance(state, SQLiteState):
+		print("[warning] multiple workers with STATE_BACKEND=memory: sessions and caches will diverge between workers")
+	return state
+
+@app.on_event("startup")
+async def check_router_config():
+	"""Fail at startup on an invalid ASI_ROUTING value instead of on the first request"""
+	get_router()
+
+@app.on_event("startup")
+async def warn_missing_api_key():
+	"""Report a missing key at startup rather than on the first chat request"""
+	if not ASI_API_KEY:
+		print("[warning] ASI_API_KEY not set. Chat requests will fail until it is added to .env or the shell.")
+
 # @app.on_event("startup")
 # async def startup_event():
 # 	"""Initialize MCP server on startup"""
@@ -70,6 +126,7 @@ app.add_middleware(
     allow_origins=["*"], allow_credentials=False,
     allow_methods=["*"], allow_headers=["*"],
 )
+app.add_middleware(ProfilerMiddleware, profiler=profiler)
 
 Role = Literal["system", "user", "assistant"]
 
@@ -81,20 +138,64 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
 	messages: List[ChatMessage]
 	stream: bool = False
+	conversation_id: Optional[str] = None
+	speculative_tools: Optional[bool] = None
 
 class ChatResponse(BaseModel):
 	message: ChatMessage
+	tool_result: Optional[Dict[str, Any]] = None
 
 @app.get("/health")
 async def health() -> Dict[str, Any]:
-	return {"status": "ok", "model": MODEL, "endpoint": ENDPOINT}
+	return {"status": "ok", "model": MODEL, "endpoint": ENDPOINT, "routing": get_router().mode, "pid": os.getpid()}
+
+@app.get("/api/router/stats")
+async def router_stats() -> Dict[str, Any]:
+	"""Get per-route latency/cost stats for the model router"""
+	return get_router().get_stats()
+
+def require_admin(token: Optional[str]):
+	if not ADMIN_TOKEN or not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+		raise HTTPException(status_code=403, detail="Admin token required")
+
+class ProfileRequest(BaseModel):
+	seconds: float = 10.0
+	requests: Optional[int] = None
+	interval_ms: float = 5.0
+
+@app.post("/admin/profile/start")
+async def start_profile(req: ProfileRequest, x_admin_token: Optional[str] = Header(None)) -> Dict[str, Any]:
+	"""Sample live traffic for N seconds or until N requests have completed"""
+	require_admin(x_admin_token)
+	if not 0 < req.seconds <= 600 or not 1 <= req.interval_ms <= 1000:
+		raise HTTPException(status_code=400, detail="seconds must be in (0, 600], interval_ms in [1, 1000]")
+	if req.requests is not None and req.requests < 1:
+		raise HTTPException(status_code=400, detail="requests must be at least 1")
+	try:
+		return profiler.start(req.seconds, req.requests, req.interval_ms)
+	except RuntimeError as e:
+		raise HTTPException(status_code=409, detail=f"{e} (pid {os.getpid()})")
+
+@app.post("/admin/profile/stop")
+async def stop_profile(x_admin_token: Optional[str] = Header(None)) -> Dict[str, Any]:
+	require_admin(x_admin_token)
+	await asyncio.to_thread(profiler.stop)
+	return profiler.status()
+
+@app.get("/admin/profile")
+async def get_profile(format: str = "json", x_admin_token: Optional[str] = Header(None)):
+	"""Aggregated stacks plus per-request wall/CPU timings; format=collapsed for flamegraph input"""
+	require_admin(x_admin_token)
+	if format == "collapsed":
+		return PlainTextResponse(profiler.collapsed(), headers={"X-Profiler-Pid": str(os.getpid())})
+	return profiler.report()
 
 @app.get("/api/tools")
 async def get_tools() -> Dict[str, Any]:
 	"""Get available tools"""
 	return {
-		# "tools": mcp.get_tools_list(),
-		# "count": len(mcp.get_tools_list())
+		# "tools": get_mcp().get_tools_list(),
+		# "count": len(get_mcp().get_tools_list())
 	}
 
 def detect_tool_usage(message_content: str) -> Optional[Dict[str, Any]]:
@@ -112,6 +213,13 @@ def detect_tool_usage(message_content: str) -> Optional[Dict[str, Any]]:
 			"arguments": {"length": length}
 		}
 	
+	# Check for wallet balance patterns (answered by the uAgent bridge)
+	if re.search(r"\b(?:wallet\s+)?balance\b", content_lower) and not re.search(r"\bswap\b", content_lower):
+		return {
+			"tool_name": "check_balance",
+			"arguments": parse_balance_arguments(message_content)
+		}
+	
 	# Look for sum/addition patterns
 	sum_patterns = [
 		r"sum\s+of\s+(\d+(?:\.\d+)?)\s+and\s+(\d+(?:\.\d+)?)",
@@ -136,9 +244,77 @@ def detect_tool_usage(message_content: str) -> Optional[Dict[str, Any]]:
 	
 	return None
 
+def upstream_headers(session_id: str) -> Dict[str, str]:
+	return {
+		"Authorization": f"Bearer {get_api_key()}",
+		"x-session-id": session_id,
+		"Content-Type": "application/json",
+	}
+
+def stream_completion(payload: Dict[str, Any], headers: Dict[str, str]) -> Iterator[Any]:
+	"""Yield content tokens from a streaming completion, then the usage dict (if any)"""
+	usage = None
+	with get_http().post(ENDPOINT, headers=headers, json={**payload, "stream": True}, timeout=TIMEOUT, stream=True) as resp:
+		resp.raise_for_status()
+		for line in resp.iter_lines(decode_unicode=True):
+			if not line or not line.startswith("data: "):
+				continue
+			line = line[len("data: ") :]
+			if line == "[DONE]":
+				break
+			try:
+				chunk = json.loads(line)
+			except json.JSONDecodeError:
+				continue
+			usage = chunk.get("usage") or usage
+			choices = chunk.get("choices")
+			if choices and choices[0].get("delta", {}).get("content"):
+				yield choices[0]["delta"]["content"]
+	yield usage or {}
+
+def get_session_id(conv_id: Optional[str]) -> str:
+	"""Return the shared session UUID for this conversation, or a fresh one"""
+	if not conv_id:
+		return str(uuid.uuid4())
+	return get_state().setdefault("sessions", conv_id, str(uuid.uuid4()), ttl=SESSION_TTL)
+
+def check_rate_limit(client: str):
+	if RATE_LIMIT_PER_MINUTE and get_state().incr("rate", client, 60) > RATE_LIMIT_PER_MINUTE:
+		raise HTTPException(status_code=429, detail="Rate limit exceeded")
+
+def cache_key(payload: Dict[str, Any]) -> str:
+	return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+_bridge_session = None
+
+def get_bridge_session():
+	"""Async HTTP session for the uAgent bridge, so cancelling a lookup aborts the request"""
+	global _bridge_session
+	if _bridge_session is None or _bridge_session.closed:
+		import aiohttp
+		_bridge_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+	return _bridge_session
+
+@app.on_event("shutdown")
+async def close_bridge_session():
+	if _bridge_session is not None:
+		await _bridge_session.close()
+
+async def run_tool(tool_usage: Dict[str, Any]) -> Dict[str, Any]:
+	"""Run a detected tool locally or through the uAgent bridge"""
+	if tool_usage["tool_name"] == "check_balance":
+		try:
+			async with get_bridge_session().post(UAGENT_BRIDGE_URL, json=bridge_request(tool_usage)) as response:
+				response.raise_for_status()
+				return await response.json()
+		except Exception as e:
+			return {"success": False, "error": f"Tool execution error: {str(e)}"}
+	return await get_mcp().call_tool(tool_usage["tool_name"], tool_usage["arguments"])
+
 # @app.post("/api/chat", response_model=ChatResponse)
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat(req: ChatRequest) -> ChatResponse:
+async def chat(req: ChatRequest, request: Request) -> ChatResponse:
+	await asyncio.to_thread(check_rate_limit, request.client.host if request.client else "unknown")
 	# Check if the last user message requires a tool
 	# last_message = req.messages[-1] if req.messages else None
 	# tool_usage = None
@@ -149,7 +325,7 @@ async def chat(req: ChatRequest) -> ChatResponse:
 	# If tool usage detected, call MCP server
 	# if tool_usage:
 	# 	try:
-	# 		# result = await mcp.call_tool(tool_usage["tool_name"], tool_usage["arguments"])
+	# 		# result = await get_mcp().call_tool(tool_usage["tool_name"], tool_usage["arguments"])
 	# 		# if result["success"]:
 	# 		# 	return ChatResponse(
 	# 		# 		message=ChatMessage(
@@ -198,26 +374,218 @@ async def chat(req: ChatRequest) -> ChatResponse:
 			msg_dict["tool_calls"] = m.tool_calls
 		messages.append(msg_dict)
 	
-	session_id = str(uuid.uuid4())
-	headers = {
-		"Authorization": f"Bearer {ASI_API_KEY}",
-		"x-session-id": session_id,
-		"Content-Type": "application/json",
-	}
-	payload = {
-		"model": MODEL,
-		"messages": messages,
-		"stream": False,
-	}
+	selection: Dict[str, Any] = {"route": None}
+	tool_task = None
+	started = time.perf_counter()
 	try:
-		resp = requests.post(ENDPOINT, headers=headers, json=payload, timeout=TIMEOUT)
+		selection = get_router().select(messages, MODEL)
+		payload = {
+			"model": selection["model"],
+			"messages": messages,
+			"stream": False,
+		}
+		key = cache_key(payload) if RESPONSE_CACHE_TTL > 0 else None
+		# Session and cached reply are fetched in one batched read; state calls may
+		# block on SQLite, so they run in worker threads like the upstream call
+		entries = []
+		if req.conversation_id:
+			entries.append(("sessions", req.conversation_id))
+		if key:
+			entries.append(("cache", key))
+		found = await asyncio.to_thread(get_state().get_many, entries) if entries else {}
+		if key and ("cache", key) in found:
+			return ChatResponse(message=ChatMessage(role="assistant", content=found[("cache", key)]))
+		session_id = found.get(("sessions", req.conversation_id)) or await asyncio.to_thread(get_session_id, req.conversation_id)
+		headers = upstream_headers(session_id)
+
+		# Run a matched read-only tool alongside the upstream call so the turn takes max(tool, LLM)
+		speculative = SPECULATIVE_TOOLS if req.speculative_tools is None else req.speculative_tools
+		last_message = req.messages[-1] if req.messages else None
+		if speculative and last_message and last_message.role == "user":
+			tool_usage = detect_tool_usage(last_message.content)
+			if tool_usage and tool_usage["tool_name"] in SPECULATIVE_SAFE_TOOLS:
+				tool_task = asyncio.create_task(run_tool(tool_usage))
+
+		started = time.perf_counter()
+		resp = await asyncio.to_thread(get_http().post, ENDPOINT, headers=headers, json=payload, timeout=TIMEOUT)
 		resp.raise_for_status()
 		data = resp.json()
 		print(data)
 		assistant_text = data["choices"][0]["message"]["content"]
+		get_router().record(selection, (time.perf_counter() - started) * 1000, data.get("usage"))
+		if key:
+			await asyncio.to_thread(get_state().set, "cache", key, assistant_text, ttl=RESPONSE_CACHE_TTL)
+
+		tool_result = None
+		if tool_task:
+			if tool_matches_reply(tool_usage["tool_name"], assistant_text):
+				tool_result = {**tool_usage, **await tool_task}
+			else:
+				tool_task.cancel()
+			tool_task = None
 		
-		return ChatResponse(message=ChatMessage(role="assistant", content=assistant_text))
+		return ChatResponse(message=ChatMessage(role="assistant", content=assistant_text), tool_result=tool_result)
 	except requests.HTTPError as e:
+		get_router().record(selection, (time.perf_counter() - started) * 1000, error=True)
 		raise HTTPException(status_code=resp.status_code, detail=resp.text)
 	except Exception as e:
+		get_router().record(selection, (time.perf_counter() - started) * 1000, error=True)
 		raise HTTPException(status_code=500, detail=str(e))
+	finally:
+		if tool_task:
+			tool_task.cancel()
+
+class PushRequest(BaseModel):
+	event: str
+	data: Dict[str, Any] = {}
+
+@app.post("/api/ws/push/{client_id}")
+async def push_to_client(client_id: str, req: PushRequest, x_admin_token: Optional[str] = Header(None)) -> Dict[str, Any]:
+	"""Push a tool or uAgent result to a connected WebSocket client (requires the admin token)"""
+	require_admin(x_admin_token)
+	delivered = await manager.push(client_id, {"event": req.event, "data": req.data})
+	if not delivered:
+		raise HTTPException(status_code=404, detail=f"Client not connected: {client_id}")
+	return {"delivered": True}
+
+async def run_ws_turn(conn, msg_id: str, turn: Dict[str, Any], messages: List[Dict[str, Any]]):
+	"""Stream one chat turn down the socket, tagged with its message id.
+
+	`turn` is the user message already appended to conn.history; the reply is
+	inserted right after it so history stays in send order.
+	"""
+	loop = asyncio.get_running_loop()
+	queue: asyncio.Queue = asyncio.Queue()
+	cancelled = False
+	try:
+		upstream = [{"role": "system", "content": system_prompt}] + messages
+		selection = get_router().select(upstream, MODEL)
+		payload = {"model": selection["model"], "messages": upstream}
+		headers = upstream_headers(conn.session_id)
+	except Exception as e:
+		conn.tasks.pop(msg_id, None)
+		await conn.send({"id": msg_id, "type": "error", "detail": str(e)})
+		return
+
+	def produce():
+		try:
+			for item in stream_completion(payload, headers):
+				if cancelled:
+					return
+				loop.call_soon_threadsafe(queue.put_nowait, ("item", item))
+			loop.call_soon_threadsafe(queue.put_nowait, ("end", None))
+		except Exception as e:
+			loop.call_soon_threadsafe(queue.put_nowait, ("error", e))
+
+	started = time.perf_counter()
+	loop.run_in_executor(None, produce)
+	parts: List[str] = []
+	usage: Dict[str, Any] = {}
+	try:
+		while True:
+			kind, item = await queue.get()
+			if kind == "error":
+				get_router().record(selection, (time.perf_counter() - started) * 1000, error=True)
+				await conn.send({"id": msg_id, "type": "error", "detail": str(item)})
+				return
+			if kind == "end":
+				break
+			if isinstance(item, dict):
+				usage = item
+				continue
+			parts.append(item)
+			await conn.send({"id": msg_id, "type": "token", "content": item})
+		content = "".join(parts)
+		get_router().record(selection, (time.perf_counter() - started) * 1000, usage)
+		# Skipped when a "messages" frame replaced the history while this turn was running
+		conn.add_reply(turn, {"role": "assistant", "content": content})
+		await conn.send({"id": msg_id, "type": "done", "content": content, "model": selection["model"]})
+	except asyncio.CancelledError:
+		try:
+			await conn.send({"id": msg_id, "type": "cancelled"})
+		except Exception:
+			pass
+		raise
+	finally:
+		# Stops the producer thread from reading further chunks after a cancel
+		cancelled = True
+		conn.tasks.pop(msg_id, None)
+
+def parse_ws_messages(raw: Any):
+	"""Validate a "messages" frame; returns the message dicts or an error string"""
+	if not isinstance(raw, list) or not raw:
+		return "'messages' must be a non-empty list of {role, content} objects"
+	messages = []
+	for i, m in enumerate(raw):
+		if not isinstance(m, dict):
+			return f"messages[{i}] must be an object with 'role' and 'content'"
+		try:
+			messages.append(ChatMessage(**m).model_dump(exclude_none=True))
+		except ValidationError:
+			return f"messages[{i}] needs 'role' (system, user or assistant) and a string 'content'"
+	if messages[-1]["role"] != "user":
+		return "The last entry in 'messages' must be a user message"
+	return messages
+
+@app.websocket("/ws/chat")
+async def ws_chat(websocket: WebSocket):
+	"""Persistent chat connection.
+
+	Client frames: {"id", "content"} to send a turn (history is kept server-side),
+	optionally {"id", "messages": [...]} to replace the history (the last entry
+	is the new user turn; only the newest WS_HISTORY_MESSAGES are kept), or
+	{"id", "type": "cancel"} to cancel an in-flight turn.
+	Server frames: {"type": "ready", "client_id"}, {"id", "type": "token" | "done" |
+	"error" | "cancelled"} and {"type": "push"}.
+	"""
+	# Generated here so a client cannot claim another client's id
+	client_id = str(uuid.uuid4())
+	conn = await manager.connect(client_id, websocket)
+	await conn.send({"type": "ready", "client_id": client_id})
+	try:
+		while True:
+			try:
+				frame = json.loads(await websocket.receive_text())
+			except json.JSONDecodeError as e:
+				await conn.send({"type": "error", "detail": f"Invalid JSON: {e}"})
+				continue
+			if not isinstance(frame, dict):
+				await conn.send({"type": "error", "detail": "Frame must be a JSON object"})
+				continue
+			msg_id = str(frame.get("id") or uuid.uuid4())
+			if frame.get("type") == "cancel":
+				task = conn.tasks.pop(msg_id, None)
+				if task:
+					task.cancel()
+				continue
+			try:
+				await asyncio.to_thread(check_rate_limit, websocket.client.host if websocket.client else "unknown")
+			except HTTPException as e:
+				await conn.send({"id": msg_id, "type": "error", "detail": e.detail})
+				continue
+			if msg_id in conn.tasks:
+				await conn.send({"id": msg_id, "type": "error", "detail": "Duplicate message id"})
+				continue
+			if "messages" in frame:
+				history = parse_ws_messages(frame["messages"])
+				if isinstance(history, str):
+					await conn.send({"id": msg_id, "type": "error", "detail": history})
+					continue
+				turn = history.pop()
+				conn.replace_history(history)
+			elif isinstance(frame.get("content"), str) and frame["content"].strip():
+				turn = {"role": "user", "content": frame["content"]}
+			else:
+				await conn.send({"id": msg_id, "type": "error", "detail": "Frame needs a non-empty 'content' string or a 'messages' list"})
+				continue
+			# Appended at dispatch so later turns see it and history keeps send order
+			messages = conn.add_turn(turn)
+			conn.tasks[msg_id] = asyncio.create_task(run_ws_turn(conn, msg_id, turn, messages))
+	except WebSocketDisconnect:
+		pass
+	finally:
+		manager.disconnect(conn)
+
+if __name__ == "__main__":
+	import uvicorn
+	uvicorn.run("server:app", host=os.getenv("HOST", "0.0.0.0"), port=PORT, workers=WORKERS)
@@ -0,0 +1,216 @@
+"""
+Shared state backends for sessions, response cache and rate-limit counters
+
+MemoryState keeps everything in the current process (single worker).
+SQLiteState keeps it in a WAL-mode SQLite file so several uvicorn workers on
+the same box see the same sessions, cache entries and counters.
+
+Entries are addressed by (namespace, key) pairs so one get_many/set_many call
+can batch lookups across namespaces (e.g. a session and a cached response).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+Entry = Tuple[str, str]
+
+
+class BaseState:
+    """Single-key helpers shared by the state backends"""
+
+    def get_many(self, entries: Iterable[Entry]) -> Dict[Entry, Any]:
+        raise NotImplementedError
+
+    def set_many(self, items: Dict[Entry, Any], ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        return self.get_many([(namespace, key)]).get((namespace, key))
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        self.set_many({(namespace, key): value}, ttl)
+
+
+class MemoryState(BaseState):
+    """In-process state, only valid with a single worker"""
+
+    def __init__(self, purge_interval: float = 60.0):
+        self.purge_interval = purge_interval
+        self._lock = threading.Lock()
+        self._data: Dict[Entry, tuple] = {}
+        self._counters: Dict[tuple, tuple] = {}
+        self._last_purge = 0.0
+
+    def _maybe_purge(self, now: float):
+        """Drop expired entries and counters; caller holds the lock"""
+        if now - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = now
+        for entry in [e for e, (_, expires) in self._data.items() if expires is not None and expires <= now]:
+            del self._data[entry]
+        for counter in [c for c, (_, expires) in self._counters.items() if expires <= now]:
+            del self._counters[counter]
+
+    def get_many(self, entries: Iterable[Entry]) -> Dict[Entry, Any]:
+        now = time.time()
+        found = {}
+        with self._lock:
+            for entry in entries:
+                item = self._data.get(entry)
+                if item and (item[1] is None or item[1] > now):
+                    found[entry] = item[0]
+        return found
+
+    def set_many(self, items: Dict[Entry, Any], ttl: Optional[float] = None):
+        now = time.time()
+        expires = now + ttl if ttl else None
+        with self._lock:
+            for entry, value in items.items():
+                self._data[entry] = (value, expires)
+            self._maybe_purge(now)
+
+    def setdefault(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> Any:
+        """Return the live value for key, storing `value` first if there is none"""
+        now = time.time()
+        with self._lock:
+            item = self._data.get((namespace, key))
+            if item is None or (item[1] is not None and item[1] <= now):
+                item = (value, now + ttl if ttl else None)
+                self._data[(namespace, key)] = item
+            self._maybe_purge(now)
+            return item[0]
+
+    def incr(self, namespace: str, key: str, window: float) -> int:
+        now = time.time()
+        bucket = int(now // window)
+        with self._lock:
+            counter = (namespace, key, bucket)
+            count = self._counters.get(counter, (0, None))[0] + 1
+            self._counters[counter] = (count, (bucket + 1) * window)
+            self._maybe_purge(now)
+            return count
+
+
+class SQLiteState(BaseState):
+    """State shared between worker processes through a WAL-mode SQLite file"""
+
+    def __init__(self, path: str, purge_interval: float = 60.0):
+        self.path = path
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._last_purge = 0.0
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires REAL,"
+                " PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, bucket INTEGER NOT NULL, count INTEGER NOT NULL, expires REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key, bucket)) WITHOUT ROWID"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets readers run alongside a writer"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def _maybe_purge(self, conn: sqlite3.Connection, now: float):
+        if now - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = now
+        conn.execute("DELETE FROM kv WHERE expires IS NOT NULL AND expires <= ?", (now,))
+        conn.execute("DELETE FROM counters WHERE expires <= ?", (now,))
+
+    def _write(self, fn):
+        """Run fn(conn, now) in one IMMEDIATE transaction"""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn, now)
+            self._maybe_purge(conn, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def get_many(self, entries: Iterable[Entry]) -> Dict[Entry, Any]:
+        entries = list(entries)
+        if not entries:
+            return {}
+        placeholders = ",".join("(?, ?)" for _ in entries)
+        params = [part for entry in entries for part in entry]
+        rows = self._conn().execute(
+            f"SELECT namespace, key, value FROM kv WHERE (namespace, key) IN (VALUES {placeholders})"
+            " AND (expires IS NULL OR expires > ?)",
+            (*params, time.time()),
+        ).fetchall()
+        return {(namespace, key): json.loads(value) for namespace, key, value in rows}
+
+    def set_many(self, items: Dict[Entry, Any], ttl: Optional[float] = None):
+        if not items:
+            return
+
+        def write(conn, now):
+            expires = now + ttl if ttl else None
+            conn.executemany(
+                "INSERT OR REPLACE INTO kv (namespace, key, value, expires) VALUES (?, ?, ?, ?)",
+                [(namespace, key, json.dumps(value), expires) for (namespace, key), value in items.items()],
+            )
+
+        self._write(write)
+
+    def setdefault(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> Any:
+        """Return the live value for key, storing `value` first if there is none"""
+
+        def write(conn, now):
+            conn.execute(
+                "DELETE FROM kv WHERE namespace = ? AND key = ? AND expires IS NOT NULL AND expires <= ?",
+                (namespace, key, now),
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO kv (namespace, key, value, expires) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), now + ttl if ttl else None),
+            )
+            return conn.execute("SELECT value FROM kv WHERE namespace = ? AND key = ?", (namespace, key)).fetchone()
+
+        return json.loads(self._write(write)[0])
+
+    def incr(self, namespace: str, key: str, window: float) -> int:
+        def write(conn, now):
+            bucket = int(now // window)
+            conn.execute(
+                "INSERT INTO counters (namespace, key, bucket, count, expires) VALUES (?, ?, ?, 1, ?)"
+                " ON CONFLICT (namespace, key, bucket) DO UPDATE SET count = count + 1",
+                (namespace, key, bucket, (bucket + 1) * window),
+            )
+            return conn.execute(
+                "SELECT count FROM counters WHERE namespace = ? AND key = ? AND bucket = ?",
+                (namespace, key, bucket),
+            ).fetchone()
+
+        return self._write(write)[0]
+
+
+def state_from_env():
+    """Build the state backend from STATE_BACKEND (memory | sqlite) and STATE_DB"""
+    backend = os.getenv("STATE_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        return SQLiteState(os.getenv("STATE_DB", "chat_state.db"))
+    if backend != "memory":
+        raise RuntimeError(f"Unknown STATE_BACKEND: {backend}")
+    return MemoryState()
@@ -0,0 +1,64 @@
+"""
+Helpers for running tools speculatively alongside the upstream LLM call
+"""
+
+import re
+from typing import Dict, Any, Optional
+
+# Tools without side effects that may run before the model has answered,
+# mapped to the MeTTa intent the model is expected to produce for them (None: no intent)
+SPECULATIVE_SAFE_TOOLS = {"sum_two_numbers": None, "check_balance": "check-balance"}
+METTA_INTENT_PATTERN = re.compile(r"\(\s*(swap-tokens|check-balance)\b")
+
+# Network aliases -> (network, native token)
+NETWORKS = {
+    "ethereum": ("ethereum", "ETH"), "etherium": ("ethereum", "ETH"),
+    "solana": ("solana", "SOL"),
+    "polygon": ("polygon", "MATIC"),
+    "arbitrum": ("arbitrum", "ETH"),
+    "optimism": ("optimism", "ETH"),
+    "bsc": ("bsc", "BNB"), "binance": ("bsc", "BNB"),
+    "bitcoin": ("bitcoin", "BTC"),
+    "cardano": ("cardano", "ADA"),
+    "tron": ("tron", "TRX"),
+}
+# Token symbols -> default network
+TOKENS = {
+    "ETH": "ethereum", "SOL": "solana", "MATIC": "polygon", "BNB": "bsc",
+    "BTC": "bitcoin", "ADA": "cardano", "TRX": "tron", "USDC": "ethereum", "USDT": "ethereum",
+}
+NETWORK_PATTERN = re.compile(r"\b(" + "|".join(NETWORKS) + r")\b")
+TOKEN_PATTERN = re.compile(r"\b(" + "|".join(TOKENS) + r")\b", re.IGNORECASE)
+WALLET_PATTERN = re.compile(r"\b(0x[0-9a-fA-F]{40}|T[1-9A-HJ-NP-Za-km-z]{33}|addr(?:_test)?1[0-9a-z]{50,})\b")
+
+
+def parse_balance_arguments(message: str) -> Dict[str, Any]:
+    """Extract network, token and (optionally) wallet from a balance question.
+
+    A missing network is taken from the token and vice versa; with neither,
+    Ethereum / ETH is assumed, matching the system prompt's example intent.
+    """
+    network_match = NETWORK_PATTERN.search(message.lower())
+    token_match = TOKEN_PATTERN.search(message)
+    network: Optional[str] = NETWORKS[network_match.group(1)][0] if network_match else None
+    token: Optional[str] = token_match.group(1).upper() if token_match else None
+    if network is None:
+        network = TOKENS[token] if token else "ethereum"
+    if token is None:
+        token = NETWORKS[network][1]
+    arguments = {"network": network, "token": token}
+    wallet_match = WALLET_PATTERN.search(message)
+    if wallet_match:
+        arguments["wallet"] = wallet_match.group(1)
+    return arguments
+
+
+def bridge_request(tool_usage: Dict[str, Any], user_id: str = "web_user") -> Dict[str, Any]:
+    """Body for the Node backend's POST /api/uagent/request"""
+    return {"operation": tool_usage["tool_name"], "params": tool_usage["arguments"], "user_id": user_id}
+
+
+def tool_matches_reply(tool_name: str, reply: str) -> bool:
+    """True when the model's MeTTa intent (or lack of one) agrees with the speculated tool"""
+    match = METTA_INTENT_PATTERN.search(reply)
+    return (match.group(1) if match else None) == SPECULATIVE_SAFE_TOOLS[tool_name]
@@ -6,6 +6,7 @@ import os
 import random
 import string
 from datetime import datetime
+from functools import lru_cache
 from typing import Dict, Any
 
 class StoreDataTool:
@@ -60,5 +61,7 @@ class StoreDataTool:
             "error": f"Unknown tool: {tool_name}"
         }
 
-# Global tool instance
-store_tool = StoreDataTool()
+@lru_cache(maxsize=None)
+def get_store_tool() -> StoreDataTool:
+    """Global tool instance, created on first use"""
+    return StoreDataTool()
@@ -0,0 +1,171 @@
+"""
+Test cases for the /api/chat endpoint
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+from unittest import mock
+import requests
+from fastapi.testclient import TestClient
+import server
+from shared_state import MemoryState
+
+def completion(content):
+    resp = mock.Mock()
+    resp.json.return_value = {"choices": [{"message": {"content": content}}], "usage": {"prompt_tokens": 5, "completion_tokens": 3}}
+    return resp
+
+class RecordingState(MemoryState):
+    """MemoryState that records whether each call ran on the event loop thread"""
+
+    def __init__(self):
+        super().__init__(purge_interval=0)
+        self.calls = []
+
+    def _record(self, name):
+        try:
+            asyncio.get_running_loop()
+            self.calls.append((name, "loop"))
+        except RuntimeError:
+            self.calls.append((name, "thread"))
+
+    def get_many(self, entries):
+        self._record("get_many")
+        return super().get_many(entries)
+
+    def set_many(self, items, ttl=None):
+        self._record("set_many")
+        return super().set_many(items, ttl)
+
+    def setdefault(self, namespace, key, value, ttl=None):
+        self._record("setdefault")
+        return super().setdefault(namespace, key, value, ttl)
+
+    def incr(self, namespace, key, window):
+        self._record("incr")
+        return super().incr(namespace, key, window)
+
+class ChatTestCase(unittest.TestCase):
+    """Patches the API key and the upstream POST for /api/chat tests"""
+
+    def setUp(self):
+        self.post = mock.Mock(return_value=completion("Hello!"))
+        for patcher in (
+            mock.patch.object(server, "ASI_API_KEY", "test-key"),
+            mock.patch.object(server.get_http(), "post", self.post),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = TestClient(server.app)
+
+    def chat(self, content, **extra):
+        return self.client.post("/api/chat", json={"messages": [{"role": "user", "content": content}], **extra})
+
+class TestChatState(ChatTestCase):
+    """Test cases for shared state access from the chat endpoint"""
+
+    def test_state_calls_run_off_the_event_loop(self):
+        state = RecordingState()
+        with mock.patch.object(server, "get_state", lambda: state), \
+                mock.patch.object(server, "RESPONSE_CACHE_TTL", 60), \
+                mock.patch.object(server, "RATE_LIMIT_PER_MINUTE", 100):
+            first = self.chat("hi", conversation_id="conv-1")
+            second = self.chat("hi", conversation_id="conv-1")
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.json()["message"]["content"], "Hello!")
+        # The second request is served from the cache
+        self.assertEqual(self.post.call_count, 1)
+        self.assertEqual(
+            [name for name, _ in state.calls],
+            ["incr", "get_many", "setdefault", "set_many", "incr", "get_many"],
+        )
+        self.assertEqual({where for _, where in state.calls}, {"thread"})
+
+class FakeTool:
+    """Stand-in for server.run_tool that takes `delay` seconds and notes a cancel"""
+
+    def __init__(self, delay, result):
+        self.delay = delay
+        self.result = result
+        self.calls = []
+        self.cancelled = threading.Event()
+
+    async def __call__(self, tool_usage):
+        self.calls.append(tool_usage)
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled.set()
+            raise
+        return self.result
+
+class TestSpeculativeTools(ChatTestCase):
+    """Test cases for running read-only tools alongside the upstream call"""
+
+    DELAY = 0.4
+
+    def setUp(self):
+        super().setUp()
+        self.tool = FakeTool(self.DELAY, {"success": True, "result": "1.5 ETH"})
+        patcher = mock.patch.object(server, "run_tool", self.tool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def reply_with(self, resp):
+        def post(*args, **kwargs):
+            time.sleep(self.DELAY)
+            return resp
+        self.post.side_effect = post
+
+    def timed_chat(self, content):
+        started = time.perf_counter()
+        resp = self.chat(content, speculative_tools=True)
+        return resp, time.perf_counter() - started
+
+    def test_matching_intent_attaches_tool_result(self):
+        self.reply_with(completion("(check-balance (network ethereum) (token ETH))"))
+        resp, elapsed = self.timed_chat("What's my ETH balance?")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["tool_result"], {
+            "tool_name": "check_balance",
+            "arguments": {"network": "ethereum", "token": "ETH"},
+            "success": True,
+            "result": "1.5 ETH",
+        })
+        self.assertFalse(self.tool.cancelled.is_set())
+        # Tool and upstream call overlap: about max(tool, LLM) rather than their sum
+        self.assertLess(elapsed, self.DELAY * 1.75)
+
+    def test_tool_without_intent_matches_plain_reply(self):
+        self.tool.result = {"success": True, "result": 5.0}
+        self.reply_with(completion("2 + 3 is 5."))
+        resp, elapsed = self.timed_chat("what is 2 + 3")
+        self.assertEqual(resp.json()["tool_result"]["result"], 5.0)
+        self.assertLess(elapsed, self.DELAY * 1.75)
+
+    def test_disagreeing_reply_cancels_tool(self):
+        self.tool.delay = self.DELAY * 5
+        self.reply_with(completion("(swap-tokens (source-network ethereum) (target-network solana))"))
+        resp, _ = self.timed_chat("What's my ETH balance?")
+        self.assertEqual(resp.status_code, 200)
+        self.assertIsNone(resp.json()["tool_result"])
+        self.assertTrue(self.tool.cancelled.wait(1))
+
+    def test_upstream_error_cancels_tool(self):
+        self.tool.delay = self.DELAY * 5
+        error = mock.Mock(status_code=502, text="bad gateway")
+        error.raise_for_status.side_effect = requests.HTTPError("502 Server Error")
+        self.reply_with(error)
+        resp, _ = self.timed_chat("What's my ETH balance?")
+        self.assertEqual((resp.status_code, resp.json()["detail"]), (502, "bad gateway"))
+        self.assertTrue(self.tool.cancelled.wait(1))
+
+    def test_disabled_speculation_runs_no_tool(self):
+        resp = self.chat("What's my ETH balance?", speculative_tools=False)
+        self.assertIsNone(resp.json()["tool_result"])
+        self.assertEqual(self.tool.calls, [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Test cases for the fast/full model router
+"""
+
+import unittest
+from model_router import ModelRouter, FAST, FULL
+
+def user(content):
+    return [{"role": "system", "content": "prompt"}, {"role": "user", "content": content}]
+
+class TestModelRouter(unittest.TestCase):
+    """Test cases for request classification and routing modes"""
+
+    def setUp(self):
+        self.router = ModelRouter("fast-model", "full-model", mode="on")
+
+    def test_intent_conversion_goes_fast(self):
+        """Short swap / balance requests use the fast model"""
+        self.assertEqual(self.router.classify(user("Swap 5 ETH from Ethereum to BNB")), FAST)
+        self.assertEqual(self.router.classify(user("What is my wallet balance?")), FAST)
+
+    def test_reasoning_goes_full(self):
+        """Open-ended questions use the full model"""
+        self.assertEqual(self.router.classify(user("Explain why staking is riskier than providing liquidity")), FULL)
+        self.assertEqual(self.router.classify(user("```python\nprint(1)\n```")), FULL)
+
+    def test_keywords_match_whole_words(self):
+        """Reasoning keywords must not match inside other words"""
+        self.assertEqual(self.router.classify(user("decode this token")), FAST)
+        self.assertEqual(self.router.classify(user("send it anyhow")), FAST)
+
+    def test_long_conversation_goes_full(self):
+        """Long messages or many turns use the full model"""
+        self.assertEqual(self.router.classify(user("swap " * 100)), FULL)
+        turns = [{"role": "user", "content": "swap"}] * 10
+        self.assertEqual(self.router.classify(turns), FULL)
+
+    def test_on_mode_uses_routed_model(self):
+        selection = self.router.select(user("swap 1 eth"), "full-model")
+        self.assertEqual(selection, {"route": FAST, "model": "fast-model", "shadow": None})
+
+    def test_off_mode_uses_default_model(self):
+        router = ModelRouter("fast-model", "full-model", mode="off")
+        selection = router.select(user("swap 1 eth"), "full-model")
+        self.assertEqual(selection, {"route": None, "model": "full-model", "shadow": None})
+
+    def test_shadow_mode_records_served_model_by_route(self):
+        """Shadow mode keeps the default model and files its stats under the route it would have picked"""
+        router = ModelRouter("fast-model", "full-model")
+        self.assertEqual(router.mode, "shadow")
+        first = router.select(user("swap 1 eth"), "default-model")
+        second = router.select(user("Explain why gas fees change"), "default-model")
+        self.assertEqual(first, {"route": None, "model": "default-model", "shadow": FAST})
+        self.assertEqual(second, {"route": None, "model": "default-model", "shadow": FULL})
+        router.record(first, 100.0, {"prompt_tokens": 7, "completion_tokens": 3})
+        router.record(second, 400.0, error=True)
+        stats = router.get_stats()
+        self.assertEqual(stats["routes"][FAST]["requests"], 0)
+        would_fast = stats["shadow"]["would_fast"]
+        self.assertEqual((would_fast["requests"], would_fast["avg_latency_ms"], would_fast["prompt_tokens"]), (1, 100.0, 7))
+        self.assertEqual((would_fast["model"], would_fast["would_use"]), ("default-model", "fast-model"))
+        self.assertEqual(stats["shadow"]["would_full"]["errors"], 1)
+
+    def test_off_mode_records_nothing(self):
+        router = ModelRouter("fast-model", "full-model", mode="off")
+        router.record(router.select(user("swap"), "default-model"), 50.0)
+        stats = router.get_stats()
+        self.assertEqual(stats["routes"][FAST]["requests"] + stats["shadow"]["would_fast"]["requests"], 0)
+
+    def test_mode_is_validated(self):
+        """Values like "false" must not silently turn live routing on"""
+        self.assertEqual(ModelRouter("f", "F", mode=" Shadow ").mode, "shadow")
+        self.assertEqual(ModelRouter("f", "F", mode="OFF").mode, "off")
+        for mode in ("false", "0", "disabled", ""):
+            with self.subTest(mode=mode):
+                with self.assertRaises(ValueError):
+                    ModelRouter("f", "F", mode=mode)
+
+    def test_record_stats(self):
+        selection = {"route": FAST, "model": "fast-model", "shadow": None}
+        self.router.record(selection, 100.0, {"prompt_tokens": 10, "completion_tokens": 5})
+        self.router.record(selection, 300.0, error=True)
+        self.router.record({"route": None}, 50.0)
+        stats = self.router.get_stats()["routes"][FAST]
+        self.assertEqual(stats["requests"], 2)
+        self.assertEqual(stats["errors"], 1)
+        self.assertEqual(stats["avg_latency_ms"], 200.0)
+        self.assertEqual(stats["prompt_tokens"], 10)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
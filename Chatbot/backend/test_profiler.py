@@ -0,0 +1,125 @@
+"""
+Test cases for the on-demand sampling profiler
+"""
+
+import asyncio
+import os
+import re
+import unittest
+from collections import Counter
+from unittest import mock
+from profiler import SamplingProfiler, ProfilerMiddleware
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+def call(app, path="/api/chat"):
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    asyncio.run(app({"type": "http", "path": path}, receive, send))
+
+class TestSamplingProfiler(unittest.TestCase):
+    """Test cases for window handling and the collapsed-stack output"""
+
+    def setUp(self):
+        self.profiler = SamplingProfiler()
+        self.addCleanup(self.profiler.stop)
+
+    def wait_closed(self):
+        self.profiler._thread.join(timeout=5)
+        self.assertFalse(self.profiler.active)
+
+    def test_window_closes_after_max_requests(self):
+        self.profiler.start(seconds=30, max_requests=2, interval_ms=1)
+        self.profiler.record_request("/a", 1.0, 0.5, 200)
+        self.assertTrue(self.profiler.active)
+        self.profiler.record_request("/b", 2.0, 0.5, 200)
+        self.wait_closed()
+        status = self.profiler.status()
+        self.assertEqual(status["requests"], 2)
+        self.assertLess(status["stopped_at"] - status["started_at"], 5)
+
+    def test_window_closes_after_seconds(self):
+        self.profiler.start(seconds=0.05, interval_ms=1)
+        self.wait_closed()
+        self.assertGreater(self.profiler.samples, 0)
+        self.assertIsNotNone(self.profiler.stopped_at)
+
+    def test_start_while_running_is_rejected(self):
+        self.profiler.start(seconds=30, interval_ms=1)
+        with self.assertRaises(RuntimeError):
+            self.profiler.start(seconds=30)
+
+    def test_collapsed_format(self):
+        self.profiler.stacks = Counter({"MainThread;a.py:main;b.py:work": 3, "MainThread;a.py:main": 1})
+        self.assertEqual(self.profiler.collapsed(), "MainThread;a.py:main;b.py:work 3\nMainThread;a.py:main 1")
+
+    def test_sampled_stacks_are_collapsed(self):
+        self.profiler.start(seconds=0.05, interval_ms=1)
+        self.wait_closed()
+        lines = self.profiler.collapsed().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            self.assertRegex(line, r"^[^;\s][^;]*(;[^;]+:[^;]+)* \d+$")
+        # The main thread was blocked in join() inside this test while it was sampled
+        self.assertTrue(any(
+            line.startswith("MainThread;") and "test_profiler.py:wait_closed" in line for line in lines
+        ))
+
+    def test_report_carries_pid(self):
+        report = self.profiler.report()
+        self.assertEqual(report["pid"], os.getpid())
+        self.assertEqual(report["request_timings"], [])
+
+class TestProfilerMiddleware(unittest.TestCase):
+    """Test cases for per-request timing"""
+
+    def test_inactive_profiler_records_nothing(self):
+        profiler = SamplingProfiler()
+        with mock.patch.object(profiler, "record_request") as record:
+            call(ProfilerMiddleware(ok_app, profiler))
+        record.assert_not_called()
+
+    def test_active_profiler_records_request(self):
+        profiler = SamplingProfiler()
+        profiler.start(seconds=30, interval_ms=50)
+        self.addCleanup(profiler.stop)
+        call(ProfilerMiddleware(ok_app, profiler), "/health")
+        [timing] = profiler.requests
+        self.assertEqual((timing["path"], timing["status"]), ("/health", 200))
+        self.assertGreaterEqual(timing["wall_ms"], 0)
+
+class TestProfileEndpoints(unittest.TestCase):
+    """Test cases for the admin profile endpoints"""
+
+    def setUp(self):
+        from fastapi.testclient import TestClient
+        import server
+        patcher = mock.patch.object(server, "ADMIN_TOKEN", "secret")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(server.profiler.stop)
+        self.client = TestClient(server.app)
+        self.headers = {"x-admin-token": "secret"}
+
+    def test_requests_must_be_positive(self):
+        for requests in (0, -1):
+            with self.subTest(requests=requests):
+                resp = self.client.post("/admin/profile/start", json={"requests": requests}, headers=self.headers)
+                self.assertEqual(resp.status_code, 400)
+
+    def test_responses_include_pid(self):
+        resp = self.client.post("/admin/profile/start", json={"seconds": 1, "requests": 1}, headers=self.headers)
+        self.assertEqual(resp.json()["pid"], os.getpid())
+        self.assertEqual(self.client.post("/admin/profile/stop", headers=self.headers).json()["pid"], os.getpid())
+        self.assertEqual(self.client.get("/admin/profile", headers=self.headers).json()["pid"], os.getpid())
+        resp = self.client.get("/admin/profile", params={"format": "collapsed"}, headers=self.headers)
+        self.assertEqual(resp.headers["x-profiler-pid"], str(os.getpid()))
+
+if __name__ == '__main__':
+    unittest.main()
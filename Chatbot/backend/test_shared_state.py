@@ -0,0 +1,100 @@
+"""
+Test cases for the shared state backends
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from shared_state import MemoryState, SQLiteState
+
+class StateBackendTests:
+    """Behaviour both backends must share; mixed into one TestCase per backend"""
+
+    def make_state(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.state = self.make_state()
+
+    def test_get_set(self):
+        self.state.set("cache", "a", {"text": "hi"})
+        self.assertEqual(self.state.get("cache", "a"), {"text": "hi"})
+        self.assertIsNone(self.state.get("cache", "missing"))
+
+    def test_batched_access_across_namespaces(self):
+        """One get_many call returns entries from several namespaces"""
+        self.state.set_many({("sessions", "c1"): "s1", ("cache", "k1"): "reply"})
+        found = self.state.get_many([("sessions", "c1"), ("cache", "k1"), ("cache", "nope")])
+        self.assertEqual(found, {("sessions", "c1"): "s1", ("cache", "k1"): "reply"})
+        self.assertEqual(self.state.get_many([]), {})
+
+    def test_ttl_expiry(self):
+        self.state.set("cache", "short", "x", ttl=0.05)
+        self.state.set("cache", "long", "y", ttl=60)
+        time.sleep(0.1)
+        self.assertIsNone(self.state.get("cache", "short"))
+        self.assertEqual(self.state.get("cache", "long"), "y")
+
+    def test_setdefault_keeps_first_value(self):
+        self.assertEqual(self.state.setdefault("sessions", "c1", "first", ttl=60), "first")
+        self.assertEqual(self.state.setdefault("sessions", "c1", "second", ttl=60), "first")
+
+    def test_setdefault_replaces_expired_value(self):
+        self.state.setdefault("sessions", "c1", "first", ttl=0.05)
+        time.sleep(0.1)
+        self.assertEqual(self.state.setdefault("sessions", "c1", "second", ttl=60), "second")
+
+    def test_incr_counts_per_window(self):
+        self.assertEqual(self.state.incr("rate", "1.2.3.4", 60), 1)
+        self.assertEqual(self.state.incr("rate", "1.2.3.4", 60), 2)
+        self.assertEqual(self.state.incr("rate", "5.6.7.8", 60), 1)
+
+    def test_incr_resets_in_new_window(self):
+        self.state.incr("rate", "ip", 0.05)
+        time.sleep(0.06)
+        self.assertEqual(self.state.incr("rate", "ip", 0.05), 1)
+
+
+class TestMemoryState(StateBackendTests, unittest.TestCase):
+    """In-process backend"""
+
+    def make_state(self):
+        return MemoryState(purge_interval=0)
+
+    def test_expired_entries_are_purged(self):
+        """Expired cache entries and counters are removed, not just hidden"""
+        self.state.set("cache", "old", "x", ttl=0.01)
+        self.state.incr("rate", "ip", 0.01)
+        time.sleep(0.02)
+        self.state.set("cache", "new", "y")
+        self.assertEqual(list(self.state._data), [("cache", "new")])
+        self.assertEqual(self.state._counters, {})
+
+
+class TestSQLiteState(StateBackendTests, unittest.TestCase):
+    """WAL-mode SQLite backend"""
+
+    def make_state(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        return SQLiteState(os.path.join(self.tmpdir, "state.db"), purge_interval=0)
+
+    def test_shared_between_instances(self):
+        """A second instance on the same file (another worker) sees the same state"""
+        other = SQLiteState(self.state.path)
+        self.state.setdefault("sessions", "c1", "s1", ttl=60)
+        self.assertEqual(other.setdefault("sessions", "c1", "s2", ttl=60), "s1")
+        self.state.incr("rate", "ip", 60)
+        self.assertEqual(other.incr("rate", "ip", 60), 2)
+
+    def test_expired_entries_are_purged(self):
+        self.state.set("cache", "old", "x", ttl=0.01)
+        time.sleep(0.02)
+        self.state.set("cache", "new", "y")
+        rows = self.state._conn().execute("SELECT key FROM kv").fetchall()
+        self.assertEqual(rows, [("new",)])
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
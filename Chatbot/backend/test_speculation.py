@@ -0,0 +1,67 @@
+"""
+Test cases for speculative tool execution helpers
+"""
+
+import unittest
+from speculation import bridge_request, parse_balance_arguments, tool_matches_reply
+
+BALANCE_REPLY = """Here is your intent:
+(check-balance
+  (network "ethereum")
+  (token "ETH")
+  (wallet "0xUSER_WALLET_ADDRESS"))"""
+
+SWAP_REPLY = """(swap-tokens
+  (source-network ethereum)
+  (target-network bnb)
+  (token "ETH")
+  (amount 5))"""
+
+class TestToolMatchesReply(unittest.TestCase):
+    """The speculated tool result is kept only when the model's intent agrees"""
+
+    def test_balance_agrees_with_check_balance_intent(self):
+        self.assertTrue(tool_matches_reply("check_balance", BALANCE_REPLY))
+
+    def test_balance_disagrees_with_swap_intent(self):
+        self.assertFalse(tool_matches_reply("check_balance", SWAP_REPLY))
+
+    def test_balance_disagrees_without_intent(self):
+        self.assertFalse(tool_matches_reply("check_balance", "Which wallet do you mean?"))
+
+    def test_sum_agrees_without_intent(self):
+        self.assertTrue(tool_matches_reply("sum_two_numbers", "2 + 3 is 5."))
+
+    def test_sum_disagrees_with_metta_intent(self):
+        self.assertFalse(tool_matches_reply("sum_two_numbers", SWAP_REPLY))
+
+class TestBalanceArguments(unittest.TestCase):
+    """Network, token and wallet extraction for the uAgent balance lookup"""
+
+    def test_network_and_token(self):
+        self.assertEqual(parse_balance_arguments("What is my USDC balance on Polygon?"), {"network": "polygon", "token": "USDC"})
+
+    def test_token_implies_network(self):
+        self.assertEqual(parse_balance_arguments("show my SOL balance"), {"network": "solana", "token": "SOL"})
+
+    def test_network_implies_token(self):
+        self.assertEqual(parse_balance_arguments("my cardano wallet balance"), {"network": "cardano", "token": "ADA"})
+
+    def test_defaults_to_ethereum(self):
+        self.assertEqual(parse_balance_arguments("What is my wallet balance?"), {"network": "ethereum", "token": "ETH"})
+
+    def test_wallet_address(self):
+        wallet = "0x1234567890abcdef1234567890abcdef12345678"
+        self.assertEqual(parse_balance_arguments(f"balance of {wallet}")["wallet"], wallet)
+
+    def test_bridge_request_body(self):
+        """Matches what server.js expects on POST /api/uagent/request"""
+        usage = {"tool_name": "check_balance", "arguments": {"network": "ethereum", "token": "ETH"}}
+        self.assertEqual(bridge_request(usage), {
+            "operation": "check_balance",
+            "params": {"network": "ethereum", "token": "ETH"},
+            "user_id": "web_user",
+        })
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
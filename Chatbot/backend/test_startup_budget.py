@@ -0,0 +1,31 @@
+"""
+Import-time budget check for the Python backend
+
+Runs with the normal unit suite. Budgets are about 1.5x the measured
+medians; set STARTUP_BUDGET_SCALE to loosen every budget on a slower machine,
+or RUN_STARTUP_BUDGET=0 to skip the check.
+"""
+
+import json
+import os
+import unittest
+from bench_startup import BUDGET_FILE, measure, check_budget
+
+@unittest.skipIf(os.getenv("RUN_STARTUP_BUDGET") == "0", "RUN_STARTUP_BUDGET=0 skips the startup budget check")
+class TestStartupBudget(unittest.TestCase):
+    """Fail when a module's import or first-request time regresses past its budget"""
+
+    def test_modules_within_budget(self):
+        with open(BUDGET_FILE) as f:
+            budgets = json.load(f)["modules"]
+        scale = float(os.getenv("STARTUP_BUDGET_SCALE", "1.0"))
+        runs = int(os.getenv("STARTUP_BUDGET_RUNS", "3"))
+        for module, budget in budgets.items():
+            with self.subTest(module=module):
+                result = measure(module, runs=runs, first_request=budget.get("first_request_path"))
+                if "ModuleNotFoundError" in result.get("error", ""):
+                    self.skipTest(f"{module}: {result['error']}")
+                self.assertEqual(check_budget(module, result, budget, scale), [])
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,162 @@
+"""
+Test cases for the /ws/chat WebSocket endpoint
+"""
+
+import threading
+import unittest
+from unittest import mock
+from fastapi.testclient import TestClient
+import server
+from ws_manager import ClientConnection
+
+class FakeStream:
+    """Stand-in for server.stream_completion; a turn whose text contains "slow" waits on `release`"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.payloads = []
+
+    def __call__(self, payload, headers):
+        self.payloads.append(payload)
+        content = payload["messages"][-1]["content"]
+        yield "echo:"
+        if "slow" in content:
+            self.release.wait(5)
+        yield content
+        yield {"prompt_tokens": 3, "completion_tokens": 2}
+
+class TestWebSocketChat(unittest.TestCase):
+    """Test cases for streaming, multiplexing and frame validation"""
+
+    def setUp(self):
+        self.stream = FakeStream()
+        for patcher in (
+            mock.patch.object(server, "stream_completion", self.stream),
+            mock.patch.object(server, "ASI_API_KEY", "test-key"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.stream.release.set)
+        self.client = TestClient(server.app)
+
+    def connect(self):
+        ws = self.client.websocket_connect("/ws/chat")
+        self.addCleanup(ws.__exit__, None, None, None)
+        ws.__enter__()
+        self.assertEqual(ws.receive_json()["type"], "ready")
+        return ws
+
+    def receive_until_done(self, ws, msg_id):
+        frames = []
+        while True:
+            frame = ws.receive_json()
+            frames.append(frame)
+            if frame.get("id") == msg_id and frame["type"] in ("done", "error", "cancelled"):
+                return frames
+
+    def test_streams_tokens_then_done(self):
+        ws = self.connect()
+        ws.send_json({"id": "1", "content": "hello"})
+        frames = self.receive_until_done(ws, "1")
+        self.assertEqual([f["type"] for f in frames], ["token", "token", "done"])
+        self.assertEqual([f["content"] for f in frames[:2]], ["echo:", "hello"])
+        self.assertEqual(frames[-1]["content"], "echo:hello")
+        self.assertTrue(all(f["id"] == "1" for f in frames))
+
+    def test_multiplexes_turns_by_id(self):
+        ws = self.connect()
+        ws.send_json({"id": "slow", "content": "slow question"})
+        self.assertEqual(ws.receive_json(), {"id": "slow", "type": "token", "content": "echo:"})
+        ws.send_json({"id": "fast", "content": "quick one"})
+        # The second turn completes while the first is still waiting upstream
+        frames = self.receive_until_done(ws, "fast")
+        self.assertEqual({f["id"] for f in frames}, {"fast"})
+        self.stream.release.set()
+        frames = self.receive_until_done(ws, "slow")
+        self.assertEqual(frames[-1]["content"], "echo:slow question")
+
+    def test_cancel_stops_turn(self):
+        ws = self.connect()
+        ws.send_json({"id": "c", "content": "slow question"})
+        self.assertEqual(ws.receive_json()["type"], "token")
+        ws.send_json({"id": "c", "type": "cancel"})
+        self.assertEqual(ws.receive_json(), {"id": "c", "type": "cancelled"})
+        self.stream.release.set()
+        # The connection keeps serving new turns after a cancel
+        ws.send_json({"id": "next", "content": "hi"})
+        self.assertEqual(self.receive_until_done(ws, "next")[-1]["type"], "done")
+
+    def test_duplicate_id_rejected(self):
+        ws = self.connect()
+        ws.send_json({"id": "dup", "content": "slow question"})
+        self.assertEqual(ws.receive_json()["type"], "token")
+        ws.send_json({"id": "dup", "content": "again"})
+        self.assertEqual(ws.receive_json(), {"id": "dup", "type": "error", "detail": "Duplicate message id"})
+        self.stream.release.set()
+        self.assertEqual(self.receive_until_done(ws, "dup")[-1]["content"], "echo:slow question")
+
+    def test_invalid_messages_frames(self):
+        ws = self.connect()
+        cases = {
+            "empty": [],
+            "not a list": {"role": "user", "content": "hi"},
+            "not objects": ["hi"],
+            "bad role": [{"role": "robot", "content": "hi"}],
+            "content not a string": [{"role": "user", "content": ["hi"]}],
+            "last not user": [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}],
+        }
+        for name, messages in cases.items():
+            with self.subTest(name):
+                ws.send_json({"id": name, "messages": messages})
+                frame = ws.receive_json()
+                self.assertEqual((frame["id"], frame["type"]), (name, "error"))
+                self.assertIn("messages", frame["detail"])
+        self.assertEqual(self.stream.payloads, [])
+
+    def test_invalid_frames(self):
+        ws = self.connect()
+        ws.send_text("{not json")
+        self.assertTrue(ws.receive_json()["detail"].startswith("Invalid JSON"))
+        ws.send_json(["content"])
+        self.assertEqual(ws.receive_json()["detail"], "Frame must be a JSON object")
+        ws.send_json({"id": "x", "content": 5})
+        self.assertEqual(ws.receive_json()["type"], "error")
+
+    def test_messages_frame_replaces_history(self):
+        ws = self.connect()
+        ws.send_json({"id": "1", "messages": [
+            {"role": "user", "content": "earlier"},
+            {"role": "assistant", "content": "reply"},
+            {"role": "user", "content": "now"},
+        ]})
+        self.receive_until_done(ws, "1")
+        upstream = self.stream.payloads[-1]["messages"]
+        self.assertEqual([m["content"] for m in upstream[1:]], ["earlier", "reply", "now"])
+
+    def test_history_is_capped(self):
+        with mock.patch.object(server.manager, "max_history", 4):
+            ws = self.connect()
+        for i in range(4):
+            ws.send_json({"id": str(i), "content": f"turn {i}"})
+            self.receive_until_done(ws, str(i))
+        upstream = self.stream.payloads[-1]["messages"]
+        self.assertEqual(upstream[0]["role"], "system")
+        self.assertEqual(
+            [m["content"] for m in upstream[1:]],
+            ["echo:turn 1", "turn 2", "echo:turn 2", "turn 3"],
+        )
+
+class TestClientConnectionHistory(unittest.TestCase):
+    """Test cases for the per-connection history cap"""
+
+    def test_reply_for_trimmed_turn_is_dropped(self):
+        conn = ClientConnection("c", websocket=None, max_history=2)
+        first = {"role": "user", "content": "first"}
+        conn.add_turn(first)
+        conn.add_turn({"role": "user", "content": "second"})
+        conn.add_turn({"role": "user", "content": "third"})
+        conn.add_reply(first, {"role": "assistant", "content": "late"})
+        self.assertEqual([m["content"] for m in conn.history], ["second", "third"])
+
+if __name__ == "__main__":
+    unittest.main()
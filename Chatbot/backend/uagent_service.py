@@ -1,11 +1,9 @@
 import asyncio
+from functools import lru_cache
 from uagents import Agent, Context, Model
 from typing import Dict, Any, Optional
 import sys
 
-# Force stdout to UTF-8
-sys.stdout.reconfigure(encoding='utf-8')
-
 
 class Web3Request(Model):
     operation: str
@@ -23,14 +21,10 @@ class Web3Response(Model):
 DECENTRABOT_ID = "agent1qv7m6tft07jqhhz7qfj83hsa735sqf243573flfd45lf7n60dn8zxlvl2gx"
 # MAILBOX_URL = "https://agents.fetch.ai/mailbox/<your-local-mailbox-id>"
 
-client = Agent(name="local_client", seed="local_client_seed", network="testnet", mailbox=True)
-
 # Handler for incoming responses
-@client.on_message(model=Web3Response)
 async def handle_response(ctx: Context, sender: str, msg: Web3Response):
     print("[DEBUG] Received response from DecentraBot:", msg.message, msg.data)
 
-@client.on_interval(period=10.0)
 async def send_periodic_request(ctx: Context):
     req = Web3Request(
         operation="check_balance",
@@ -42,8 +36,17 @@ async def send_periodic_request(ctx: Context):
     await ctx.send(DECENTRABOT_ID, req)
 
 
+@lru_cache(maxsize=None)
+def get_client() -> Agent:
+    """Build the local client agent on first use instead of at import"""
+    client = Agent(name="local_client", seed="local_client_seed", network="testnet", mailbox=True)
+    client.on_message(model=Web3Response)(handle_response)
+    client.on_interval(period=10.0)(send_periodic_request)
+    return client
 
 
 if __name__ == "__main__":
+    # Force stdout to UTF-8
+    sys.stdout.reconfigure(encoding='utf-8')
     # Run both sending and receiving
-    client.run()
+    get_client().run()
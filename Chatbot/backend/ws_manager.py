@@ -0,0 +1,94 @@
+"""
+WebSocket connection manager for persistent per-client chat connections
+"""
+
+import asyncio
+import os
+import uuid
+from typing import Dict, Any, List, Optional
+from fastapi import WebSocket
+
+
+class ClientConnection:
+    """One connected client: socket, send lock, history and in-flight turns"""
+
+    def __init__(self, client_id: str, websocket: WebSocket, max_history: int = 40):
+        self.client_id = client_id
+        self.websocket = websocket
+        self.session_id = str(uuid.uuid4())
+        self.max_history = max_history
+        self.history: List[Dict[str, Any]] = []
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self._send_lock = asyncio.Lock()
+
+    async def send(self, payload: Dict[str, Any]):
+        """Send a JSON frame; turns run concurrently so writes are serialized"""
+        async with self._send_lock:
+            await self.websocket.send_json(payload)
+
+    def _trim(self):
+        """Keep only the most recent max_history messages"""
+        if len(self.history) > self.max_history:
+            del self.history[: len(self.history) - self.max_history]
+
+    def replace_history(self, messages: List[Dict[str, Any]]):
+        self.history = list(messages)
+        self._trim()
+
+    def add_turn(self, turn: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Append a user turn at dispatch time; returns the history to send upstream"""
+        self.history.append(turn)
+        self._trim()
+        return list(self.history)
+
+    def add_reply(self, turn: Dict[str, Any], reply: Dict[str, Any]):
+        """Insert a reply right after its own user turn, if that turn is still kept"""
+        index = next((i for i, m in enumerate(self.history) if m is turn), None)
+        if index is not None:
+            self.history.insert(index + 1, reply)
+            self._trim()
+
+    def cancel_all(self):
+        """Cancel every in-flight turn for this client"""
+        for task in self.tasks.values():
+            task.cancel()
+        self.tasks.clear()
+
+
+class ConnectionManager:
+    """Track open chat connections so the server can push to them"""
+
+    def __init__(self, max_history: int = 40):
+        self.max_history = max_history
+        self.clients: Dict[str, ClientConnection] = {}
+
+    async def connect(self, client_id: str, websocket: WebSocket) -> ClientConnection:
+        """Accept the socket and register it, replacing any stale connection"""
+        await websocket.accept()
+        stale = self.clients.get(client_id)
+        if stale:
+            stale.cancel_all()
+        conn = ClientConnection(client_id, websocket, self.max_history)
+        self.clients[client_id] = conn
+        return conn
+
+    def disconnect(self, conn: ClientConnection):
+        """Drop a connection and cancel its in-flight turns"""
+        conn.cancel_all()
+        if self.clients.get(conn.client_id) is conn:
+            del self.clients[conn.client_id]
+
+    def get(self, client_id: str) -> Optional[ClientConnection]:
+        return self.clients.get(client_id)
+
+    async def push(self, client_id: str, payload: Dict[str, Any]) -> bool:
+        """Server-initiated push (e.g. tool or uAgent result) to one client"""
+        conn = self.clients.get(client_id)
+        if conn is None:
+            return False
+        await conn.send({"type": "push", **payload})
+        return True
+
+
+# Global connection manager; WS_HISTORY_MESSAGES caps per-connection history
+manager = ConnectionManager(int(os.getenv("WS_HISTORY_MESSAGES", "40")))